@@ -0,0 +1,265 @@
+import asyncio
+import binascii
+import functools
+import hmac
+import logging
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import orjson
+
+# Responses worth retrying: rate limiting and transient server errors
+_RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+
+# Feishu error codes worth retrying: 11232 is "frequency limited"
+_RETRY_CODES = frozenset((11232,))
+
+
+class FeishuAPIError(Exception):
+    """The webhook accepted the request but Feishu reported a non-zero code."""
+
+    def __init__(self, code: int, msg: str):
+        super().__init__(f"Feishu error {code}: {msg}")
+        self.code = code
+        self.msg = msg
+
+
+def is_retryable_error(exc: BaseException) -> bool:
+    """
+    Tell whether a send failure is transient and worth retrying later.
+
+    :param exc: Exception raised by FeishuRobotSender
+    :return: True for transport errors, retryable statuses and rate limiting
+    """
+    if isinstance(exc, FeishuAPIError):
+        return exc.code in _RETRY_CODES
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in _RETRY_STATUSES
+    return isinstance(exc, httpx.TransportError)
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    """
+    Read the Retry-After header as a delay in seconds.
+
+    :param response: Webhook response
+    :return: Delay in seconds, or None if the header is missing or invalid
+    """
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+@functools.lru_cache(maxsize=256)
+def _at_prefix(user_ids: Tuple[str, ...]) -> str:
+    """
+    Build the @ mention fragment for a group of users.
+
+    :param user_ids: User Open IDs to mention
+    :return: Space separated <at> tags
+    """
+    return ' '.join([f'<at user_id="{user_id}"></at>' for user_id in user_ids])
+
+
+class FeishuRobotSender:
+    def __init__(
+        self,
+        webhook_url: str,
+        secret: Optional[str] = None,
+        max_retries: int = 3,
+        backoff_factor: float = 0.3
+    ):
+        """
+        Initialize the Feishu Robot Sender.
+
+        :param webhook_url: The webhook URL of the Feishu custom robot
+        :param secret: Optional secret for signature verification
+        :param max_retries: Retries for failed connections and retryable replies
+        :param backoff_factor: Base delay in seconds, doubled on each retry unless
+            the reply carries Retry-After
+        """
+        self.webhook_url = webhook_url
+        self.secret = secret
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self._secret_suffix = ("\n" + secret).encode("utf-8") if secret else None
+        # Signature of the most recent second, reused by sends within it
+        self._cached_ts = 0
+        self._cached_sign = None
+        self.logger = logging.getLogger(__name__)
+        # Connection failures are retried inside the transport itself
+        transport = httpx.AsyncHTTPTransport(
+            http2=True,
+            retries=max_retries,
+            limits=httpx.Limits(max_connections=16, max_keepalive_connections=4)
+        )
+        self._client = httpx.AsyncClient(
+            transport=transport,
+            headers={'Content-Type': 'application/json'}
+        )
+
+    async def close(self) -> None:
+        """
+        Close the underlying HTTP client and release pooled connections.
+        """
+        await self._client.aclose()
+
+    async def __aenter__(self) -> "FeishuRobotSender":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    def _generate_sign(self) -> Dict[str, str]:
+        """
+        Generate signature for webhook request if secret is provided.
+
+        :return: Dictionary with timestamp and sign
+        """
+        if not self.secret:
+            return {}
+
+        timestamp = int(time.time())
+        if timestamp == self._cached_ts and self._cached_sign:
+            return {
+                "timestamp": str(timestamp),
+                "sign": self._cached_sign
+            }
+
+        # Feishu signs an empty message keyed by "timestamp\nsecret"
+        key = str(timestamp).encode('ascii') + self._secret_suffix
+        hmac_code = hmac.digest(key, b"", "sha256")
+        sign = binascii.b2a_base64(hmac_code, newline=False).decode('ascii')
+        self._cached_ts = timestamp
+        self._cached_sign = sign
+
+        return {
+            "timestamp": str(timestamp),
+            "sign": sign
+        }
+
+    async def send_text_message(
+        self,
+        text: str,
+        at_users: Optional[List[str]] = None,
+        at_all: bool = False
+    ) -> Dict:
+        """
+        Send a text message to the Feishu robot.
+
+        :param text: Message text
+        :param at_users: List of user Open IDs to mention
+        :param at_all: Whether to mention all members
+        :return: Response from the webhook
+        """
+        # Construct @ mentions
+        if at_users:
+            text = f"{_at_prefix(tuple(at_users))} {text}"
+
+        if at_all:
+            text = '<at user_id="all"></at> ' + text
+
+        payload = {
+            "msg_type": "text",
+            "content": {
+                "text": text
+            }
+        }
+
+        return await self._send_message(payload)
+
+    async def send_post_message(
+        self,
+        title: str,
+        content: List[List[Dict]],
+        language: str = 'zh_cn'
+    ) -> Dict:
+        """
+        Send a rich text (post) message.
+
+        :param title: Message title
+        :param content: Rich text content structure
+        :param language: Language of the message (zh_cn or en_us)
+        :return: Response from the webhook
+        """
+        payload = {
+            "msg_type": "post",
+            "content": {
+                "post": {
+                    language: {
+                        "title": title,
+                        "content": content
+                    }
+                }
+            }
+        }
+
+        return await self._send_message(payload)
+
+    async def send_card_message(self, card: Dict) -> Dict:
+        """
+        Send an interactive card message.
+
+        :param card: Card message structure
+        :return: Response from the webhook
+        """
+        payload = {
+            "msg_type": "interactive",
+            "card": card
+        }
+
+        return await self._send_message(payload)
+
+    async def _send_message(self, payload: Dict) -> Dict:
+        """
+        Send message to Feishu webhook with optional signature.
+
+        :param payload: Message payload
+        :return: Response from the webhook
+        :raises httpx.HTTPError: If the request still fails after all retries
+        :raises FeishuAPIError: If Feishu still reports a non-zero code after all retries
+        """
+        # Add signature if secret is provided
+        sign_params = self._generate_sign()
+        payload.update(sign_params)
+
+        # Content-Type is set on the client; orjson emits UTF-8 bytes directly
+        body = orjson.dumps(payload)
+        for attempt in range(self.max_retries + 1):
+            response = await self._client.post(self.webhook_url, content=body)
+            result = None
+            if response.is_success:
+                # Decode straight from bytes; Feishu always replies with UTF-8 JSON
+                result = orjson.loads(response.content)
+                # Feishu reports most failures as HTTP 200 with a non-zero code
+                code = result.get("code", 0)
+                if code == 0:
+                    return result
+                retryable = code in _RETRY_CODES
+                reason = f"code {code}"
+            else:
+                retryable = response.status_code in _RETRY_STATUSES
+                reason = f"status {response.status_code}"
+            if not retryable or attempt == self.max_retries:
+                break
+
+            delay = _retry_after(response)
+            if delay is None:
+                delay = self.backoff_factor * (2 ** attempt)
+            self.logger.warning(f"Webhook returned {reason}, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+        if result is None:
+            response.raise_for_status()
+        raise FeishuAPIError(result.get("code"), result.get("msg", ""))
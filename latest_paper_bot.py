@@ -1,24 +1,42 @@
 #%%
-import feedparser
+import asyncio
+import atexit
+import calendar
 import time
-import requests
-from datetime import datetime, timedelta
-from typing import Optional
-import pytz
-import hmac
-import hashlib
-import base64
-import json
+import httpx
+from collections import OrderedDict
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
 import click
 import logging
-import logging.handlers
 import os
+import queue
 import sys
 
+from feishu_sender import FeishuRobotSender, is_retryable_error
+
+# Maximum number of sent entry IDs remembered before the oldest are evicted
+MAX_SENT_ENTRIES = 10_000
+
+# Maximum number of notifications combined into a single card message
+NOTIFICATIONS_PER_CARD = 10
+
+# Longest summary shown per notification. Feishu rejects cards over ~30 KB, and
+# 10 summaries of 500 CJK characters (3 bytes each in UTF-8) stay well below that
+MAX_CONTENT_CHARS = 500
+
+# Polls on which a notification that failed transiently is sent again before giving up
+MAX_SEND_RETRIES = 3
+
+_UTC = timezone.utc
+_SHANGHAI = ZoneInfo("Asia/Shanghai")
+
 
 # Set up logging
 def setup_logging(debug: bool = False):
     """Set up logging configuration"""
+    import logging.handlers
+
     # Create logs directory if it doesn't exist
     log_dir = "logs"
     if not os.path.exists(log_dir):
@@ -37,145 +55,180 @@ def setup_logging(debug: bool = False):
         logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
     )
     
+    # Hand records to a background thread so file/stdout writes never block callers
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler)
+    listener.start()
+    atexit.register(listener.stop)
+
     # Configure root logger
     logger = logging.getLogger()
     logger.setLevel(logging.DEBUG if debug else logging.INFO)
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
     
     return logger
 
 
-class FeishuRobotSender:
-    def __init__(self, webhook_url: str, secret: Optional[str] = None):
-        self.webhook_url = webhook_url
-        self.secret = secret
-        self.logger = logging.getLogger(__name__)
+class RSSFeedFetcher:
+    def __init__(self, rss_url: str, client: httpx.AsyncClient):
+        self.rss_url = rss_url
+        self._http = client
+        # Validators from the last handled response, sent back as a conditional GET
+        self._etag = None
+        self._last_modified = None
+        # Validators from the latest response, adopted once commit() is called
+        self._pending_etag = None
+        self._pending_last_modified = None
 
-    def _generate_sign(self) -> dict:
-        if not self.secret:
-            return {}
-        
-        timestamp = int(time.time())
-        string_to_sign = f"{timestamp}\n{self.secret}"
-        
-        hmac_code = hmac.new(
-            string_to_sign.encode("utf-8"), 
-            digestmod=hashlib.sha256
-        ).digest()
-        sign = base64.b64encode(hmac_code).decode('utf-8')
-        
-        return {
-            "timestamp": str(timestamp),
-            "sign": sign
-        }
-
-    def send_text_message(self, text: str) -> dict:
-        payload = {
-            "msg_type": "text",
-            "content": {
-                "text": text
-            }
-        }
-        return self._send_message(payload)
-
-    def send_card_message(self, card: dict) -> dict:
+    async def fetch(self):
         """
-        Send an interactive card message.
-        
-        :param card: Card message structure
-        :return: Response from the webhook
+        Download and parse the feed unless it is unchanged since the last fetch.
+
+        :return: Parsed feed, or None if the server answered 304 Not Modified
         """
-        payload = {
-            "msg_type": "interactive",
-            "card": card
-        }
-        
-        return self._send_message(payload)
+        # Imported on first use to keep feedparser's import graph out of startup
+        import feedparser
 
-    def _send_message(self, payload: dict) -> dict:
-        sign_params = self._generate_sign()
-        payload.update(sign_params)
-        
-        try:
-            response = requests.post(
-                self.webhook_url, 
-                json=payload,
-                headers={'Content-Type': 'application/json'}
-            )
-            response.raise_for_status()
-            return response.json()
-        except requests.RequestException as e:
-            self.logger.error(f"Failed to send message: {str(e)}")
-            return {"error": str(e), "payload": payload}
-
-
-def get_new_notifications(rss_url: str, last_checked: datetime, sent_entries: set, debug: bool = False):
+        headers = {}
+        if self._etag:
+            headers['If-None-Match'] = self._etag
+        if self._last_modified:
+            headers['If-Modified-Since'] = self._last_modified
+
+        response = await self._http.get(self.rss_url, headers=headers)
+        if response.status_code == 304:
+            return None
+        response.raise_for_status()
+
+        self._pending_etag = response.headers.get('ETag')
+        self._pending_last_modified = response.headers.get('Last-Modified')
+        # Parse in a worker thread so the event loop keeps serving other tasks
+        return await asyncio.to_thread(feedparser.parse, response.content)
+
+    def commit(self) -> None:
+        """
+        Mark the last fetched feed as handled.
+
+        Until this is called, later fetches keep requesting the full feed, so its
+        entries are seen again if processing them failed.
+        """
+        self._etag = self._pending_etag
+        self._last_modified = self._pending_last_modified
+
+
+async def get_new_notifications(fetcher: RSSFeedFetcher, last_checked: datetime,
+                                sent_entries: OrderedDict, debug: bool = False,
+                                feed_sorted: bool = True):
     """
     Fetch new notifications from the RSS feed.
     Args:
-        rss_url: RSS feed URL
+        fetcher: Fetcher for the RSS feed
         last_checked: Last check timestamp (should be in UTC)
-        sent_entries: Set of already sent entry IDs
+        sent_entries: LRU-ordered mapping of already sent entry IDs
         debug: Debug mode flag
+        feed_sorted: Whether the feed lists entries newest first, which lets
+            the scan stop at the first entry older than last_checked
     """
     logger = logging.getLogger(__name__)
-    feed = feedparser.parse(rss_url)
+    feed = await fetcher.fetch()
+    if feed is None:
+        logger.debug("Feed not modified since last check")
+        return []
     new_notifications = []
 
     # 确保 last_checked 是 UTC 时间
     if last_checked.tzinfo is None:
-        last_checked = last_checked.replace(tzinfo=pytz.UTC)
+        last_checked = last_checked.replace(tzinfo=_UTC)
+    last_checked_ts = last_checked.timestamp()
 
     if debug:
         logger.debug("=== Time Debug Info ===")
-        logger.debug(f"Current Beijing time: {datetime.now(pytz.timezone('Asia/Shanghai'))}")
-        logger.debug(f"Current UTC time: {datetime.now(pytz.UTC)}")
+        logger.debug(f"Current Beijing time: {datetime.now(_SHANGHAI)}")
+        logger.debug(f"Current UTC time: {datetime.now(_UTC)}")
         logger.debug(f"Last checked (UTC): {last_checked}")
 
     for entry in feed.entries:
         entry_id = entry.get('id', entry.link)
         
         if entry_id in sent_entries:
+            sent_entries.move_to_end(entry_id)
             continue
             
-        # Parse published time as UTC
-        published_time = datetime(*entry.published_parsed[:6], tzinfo=pytz.UTC)
+        # published_parsed is a UTC struct_time; compare as POSIX seconds
+        published_ts = calendar.timegm(entry.published_parsed)
         
         if debug:
+            published_time = datetime.fromtimestamp(published_ts, _UTC)
             logger.debug("=== Entry Debug Info ===")
             logger.debug(f"Entry title: {entry.title}")
             logger.debug(f"Published time (UTC): {published_time}")
-            logger.debug(f"Published time (Beijing): {published_time.astimezone(pytz.timezone('Asia/Shanghai'))}")
-            logger.debug(f"Is new? {published_time > last_checked}")
+            logger.debug(f"Published time (Beijing): {published_time.astimezone(_SHANGHAI)}")
+            logger.debug(f"Is new? {published_ts > last_checked_ts}")
         
-        if published_time > last_checked:
-            new_notifications.append({
-                "title": entry.title,
-                "content": entry.summary,
-                "published": published_time,
-                "id": entry_id
-            })
+        if published_ts <= last_checked_ts:
+            if feed_sorted:
+                # Every remaining entry is older still
+                break
+            continue
+
+        new_notifications.append({
+            "title": entry.title,
+            "content": entry.summary,
+            "published": datetime.fromtimestamp(published_ts, _UTC),
+            "id": entry_id
+        })
     
     return new_notifications
 
 
-@click.command()
-@click.option('--webhook-url', default='https://open.feishu.cn/open-apis/bot/v2/hook/4ff10d4b-50d3-4f3e-99b5-cac11cacbd2d',
-              help='Feishu webhook URL')
-@click.option('--rss-url', default='https://notifier.in/rss/mx853qfq9ale56gsx0vm48d0w8w1e0tb.xml',
-              help='RSS feed URL')
-@click.option('--debug/--no-debug', default=False, help='Enable debug mode')
-@click.option('--reference-time', default='2024-12-22 19:19:22',
-              help='Reference time in format YYYY-MM-DD HH:MM:SS')
-def main(webhook_url: str, rss_url: str, debug: bool, reference_time: str):
-    """Monitor RSS feed and send notifications via Feishu."""
+# Card parts that never change; shared by every card since payloads are only serialized
+_HEADER = {
+    "title": {
+        "content": "New Paper Notification",
+        "tag": "plain_text"
+    },
+    "template": "blue"
+}
+_DIVIDER = {"tag": "hr"}
+
+
+def _make_div(content: str) -> dict:
+    """Wrap markdown text in a card div element."""
+    return {"tag": "div", "text": {"content": content, "tag": "lark_md"}}
+
+
+def build_notification_card(notifications: list) -> dict:
+    """
+    Build one interactive card listing several notifications.
+
+    :param notifications: Notifications as returned by get_new_notifications
+    :return: Card message structure
+    """
+    logger = logging.getLogger(__name__)
+    elements = []
+    for notification in notifications:
+        title = notification["title"]
+        content = notification["content"]
+        if len(content) > MAX_CONTENT_CHARS:
+            content = content[:MAX_CONTENT_CHARS] + "…"
+        beijing_time = notification["published"].astimezone(_SHANGHAI).strftime("%Y-%m-%d %H:%M:%S %Z")
+
+        logger.debug(f"Processing notification: {title}")
+
+        if elements:
+            elements.append(_DIVIDER)
+        elements.append(_make_div(f"**Title**\n{title}"))
+        elements.append(_make_div(f"**Content**\n{content}"))
+        elements.append(_make_div(f"**Published Time**\n{beijing_time}"))
+
+    return {"header": _HEADER, "elements": elements}
+
+
+async def run_bot(webhook_url: str, rss_url: str, debug: bool, reference_time: str):
+    """Poll the RSS feed and push new entries to Feishu until cancelled."""
     # Set up logging
     logger = setup_logging(debug)
     logger.info("Starting paper notification bot...")
-    
-    # Initialize Feishu robot sender
-    robot = FeishuRobotSender(webhook_url)
 
     # 开发模式设置
     CHECK_INTERVAL = 60 if debug else 3600  # 测试时1分钟检查一次，正式环境1小时检查
@@ -183,81 +236,95 @@ def main(webhook_url: str, rss_url: str, debug: bool, reference_time: str):
 
     # 使用用户提供的参考时间
     reference_dt = datetime.strptime(reference_time, "%Y-%m-%d %H:%M:%S")
-    reference_dt = pytz.timezone('Asia/Shanghai').localize(reference_dt)
-    last_checked = reference_dt.astimezone(pytz.UTC)  # 转换为UTC时间
+    reference_dt = reference_dt.replace(tzinfo=_SHANGHAI)
+    last_checked = reference_dt.astimezone(_UTC)  # 转换为UTC时间
     logger.info(f"Reference time set to {reference_time} (Beijing time)")
-    sent_entries = set()
+    sent_entries = OrderedDict()
+    # Failed notifications to send again next poll, mapped to the retries used so far
+    pending = {}
 
-    while True:
-        try:
-            logger.debug("Checking for new notifications...")
-            new_notifications = get_new_notifications(rss_url, last_checked, sent_entries, debug)
-            
-            if new_notifications:
-                logger.info(f"Found {len(new_notifications)} new notifications")
-                
-                for notification in new_notifications:
-                    title = notification["title"]
-                    content = notification["content"]
-                    beijing_time = notification["published"].astimezone(
-                        pytz.timezone('Asia/Shanghai')
-                    ).strftime("%Y-%m-%d %H:%M:%S %Z")
-                    
-                    logger.debug(f"Processing notification: {title}")
-                    
-                    # Create card message
-                    card = {
-                        "header": {
-                            "title": {
-                                "content": "New Paper Notification",
-                                "tag": "plain_text"
-                            },
-                            "template": "blue"
-                        },
-                        "elements": [
-                            {
-                                "tag": "div",
-                                "text": {
-                                    "content": f"**Title**\n{title}",
-                                    "tag": "lark_md"
-                                }
-                            },
-                            {
-                                "tag": "div",
-                                "text": {
-                                    "content": f"**Content**\n{content}",
-                                    "tag": "lark_md"
-                                }
-                            },
-                            {
-                                "tag": "div",
-                                "text": {
-                                    "content": f"**Published Time**\n{beijing_time}",
-                                    "tag": "lark_md"
-                                }
-                            }
-                        ]
-                    }
-                    
-                    response = robot.send_card_message(card)
-                    logger.info(f"Sent notification: {title}")
-                    logger.debug(f"Feishu Response: {response}")
-
-                    sent_entries.add(notification["id"])
-
-            else:
-                logger.debug(f"No new notifications at {datetime.now()}")
-
-        except Exception as e:
-            logger.error(f"Error occurred: {str(e)}", exc_info=True)
-
-        # Update the last checked time (in UTC)
-        last_checked = datetime.now(pytz.UTC)
-        logger.debug(f"Updated last_checked to {last_checked}")
-        
-        # Sleep for the specified interval
-        logger.debug(f"Sleeping for {CHECK_INTERVAL} seconds")
-        time.sleep(CHECK_INTERVAL)
+    # Initialize Feishu robot sender and the feed client; both are closed on exit
+    async with FeishuRobotSender(webhook_url) as robot, \
+            httpx.AsyncClient(follow_redirects=True) as client:
+        fetcher = RSSFeedFetcher(rss_url, client)
+        # Polls are scheduled against a monotonic deadline so their duration doesn't accumulate
+        next_poll = time.monotonic() + CHECK_INTERVAL
+        while True:
+            poll_started = datetime.now(_UTC)
+            try:
+                logger.debug("Checking for new notifications...")
+                new_notifications = await get_new_notifications(
+                    fetcher, last_checked, sent_entries, debug
+                )
+
+                # The feed is handled once its notifications are sent or queued for retry
+                fetcher.commit()
+                last_checked = poll_started
+                logger.debug(f"Updated last_checked to {last_checked}")
+
+                retries, pending = pending, {}
+                if new_notifications or retries:
+                    logger.info(f"Found {len(new_notifications)} new notifications, "
+                                f"retrying {len(retries)}")
+
+                    batches = [
+                        new_notifications[i:i + NOTIFICATIONS_PER_CARD]
+                        for i in range(0, len(new_notifications), NOTIFICATIONS_PER_CARD)
+                    ]
+                    # Retried notifications go on their own card so a bad one can't block others
+                    batches.extend([notification] for notification, _ in retries.values())
+                    # Send one card per batch, concurrently so their round-trips overlap
+                    responses = await asyncio.gather(
+                        *(robot.send_card_message(build_notification_card(batch))
+                          for batch in batches),
+                        return_exceptions=True
+                    )
+                    for batch, response in zip(batches, responses):
+                        if isinstance(response, Exception):
+                            logger.error(f"Failed to send {len(batch)} notifications: {response}")
+                            # A shared card may have failed because of one entry, so its
+                            # entries are retried alone; lone cards only on transient errors
+                            retryable = len(batch) > 1 or is_retryable_error(response)
+                            for notification in batch:
+                                _, used = retries.get(notification["id"], (None, 0))
+                                if retryable and used < MAX_SEND_RETRIES:
+                                    pending[notification["id"]] = (notification, used + 1)
+                                else:
+                                    logger.error(f"Giving up on notification: {notification['title']}")
+                            continue
+                        logger.debug(f"Feishu Response: {response}")
+                        for notification in batch:
+                            logger.info(f"Sent notification: {notification['title']}")
+
+                            sent_entries[notification["id"]] = None
+                            if len(sent_entries) > MAX_SENT_ENTRIES:
+                                sent_entries.popitem(last=False)
+
+                else:
+                    logger.debug(f"No new notifications at {datetime.now()}")
+
+            except Exception as e:
+                logger.error(f"Error occurred: {str(e)}", exc_info=True)
+
+            # Sleep until the next scheduled poll
+            sleep_for = max(0, next_poll - time.monotonic())
+            logger.debug(f"Sleeping for {sleep_for:.1f} seconds")
+            await asyncio.sleep(sleep_for)
+            # Re-anchor after an overrun instead of firing missed polls back-to-back
+            next_poll = max(next_poll + CHECK_INTERVAL, time.monotonic())
+
+
+@click.command()
+@click.option('--webhook-url', default='https://open.feishu.cn/open-apis/bot/v2/hook/4ff10d4b-50d3-4f3e-99b5-cac11cacbd2d',
+              help='Feishu webhook URL')
+@click.option('--rss-url', default='https://notifier.in/rss/mx853qfq9ale56gsx0vm48d0w8w1e0tb.xml',
+              help='RSS feed URL')
+@click.option('--debug/--no-debug', default=False, help='Enable debug mode')
+@click.option('--reference-time', default='2024-12-22 19:19:22',
+              help='Reference time in format YYYY-MM-DD HH:MM:SS')
+def main(webhook_url: str, rss_url: str, debug: bool, reference_time: str):
+    """Monitor RSS feed and send notifications via Feishu."""
+    asyncio.run(run_bot(webhook_url, rss_url, debug, reference_time))
 
 if __name__ == "__main__":
     main()